@@ -93,7 +93,7 @@ LIMIT 20;
 -- Shows how vulnerability changes throughout the week
 SELECT 
     CASE 
-        WHEN day_of_week IN ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday') THEN 'Weekday'
+        WHEN day_of_week BETWEEN 0 AND 4 THEN 'Weekday'  -- Monday = 0
         ELSE 'Weekend'
     END as period_type,
     CASE 
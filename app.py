@@ -4,9 +4,9 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import random
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
+import threading
+from contextlib import contextmanager
+from itertools import chain, islice
 
 # Page configuration
 st.set_page_config(
@@ -38,6 +38,303 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# day_of_week is stored as 0 (Monday) .. 6 (Sunday) and mapped to these names for display.
+# Ordered so groupbys and pivots come out Monday-first without reindexing.
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], ordered=True
+)
+
+# Stored as names here; main.py stores them as indexes into these lists
+DEVICE_TYPES = ['Desktop', 'Mobile', 'Tablet']
+LOCATIONS = ['Office', 'Remote', 'Coffee Shop', 'Airport']
+
+# Column types for the fact frame, applied as it is read so pandas skips inference.
+# Aggregated columns stay numeric even for an empty result, and dimensions
+# group on category codes rather than Python strings.
+FACT_DTYPES = {
+    'hour_of_day': 'int8',
+    'clicked_link': 'int8',
+    'provided_credentials': 'int8',
+    'security_training_score': 'float64',
+    'department': 'category',
+    'device_type': 'category',
+    'location': 'category',
+    'day_of_week': 'int8',
+}
+
+# Cached read-only queries, keyed on the dataset version so reruns
+# (tab switches, slider changes) don't hit SQLite until data changes
+def _read_query(db_path, query, dtype=None):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query(query, conn, dtype=dtype)
+    finally:
+        conn.close()
+
+@st.cache_data(ttl=3600)
+def cached_summary_stats(db_path, data_version):
+    """Get summary statistics"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+
+        stats = {}
+
+        cursor.execute('SELECT COUNT(*) FROM employees')
+        stats['total_employees'] = cursor.fetchone()[0]
+
+        cursor.execute('SELECT COUNT(*) FROM phishing_simulations')
+        stats['total_simulations'] = cursor.fetchone()[0]
+
+        if stats['total_simulations'] > 0:
+            cursor.execute('''
+                SELECT
+                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1)
+                FROM phishing_simulations
+            ''')
+            stats['click_rate'] = cursor.fetchone()[0]
+
+            cursor.execute('''
+                SELECT
+                    ROUND(100.0 * SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) / COUNT(*), 1)
+                FROM phishing_simulations
+            ''')
+            stats['credential_rate'] = cursor.fetchone()[0]
+        else:
+            stats['click_rate'] = 0
+            stats['credential_rate'] = 0
+
+        return stats
+    finally:
+        conn.close()
+
+def _round1(values):
+    """Round to one decimal, half away from zero like SQLite's ROUND(x, 1)"""
+    return np.floor(values * 10.0 + 0.5) / 10.0
+
+def _click_rate_table(df, keys, count_name, min_count=1):
+    """Per-group row count and click rate, keeping groups with at least min_count rows"""
+    grouped = df.groupby(keys, observed=True)['clicked_link'].agg(['size', 'mean'])
+    grouped = grouped[grouped['size'] >= min_count].reset_index()
+    grouped['click_rate'] = _round1(100.0 * grouped.pop('mean'))
+    return grouped.rename(columns={'size': count_name})
+
+@st.cache_data(ttl=3600)
+def cached_fact_frame(db_path, data_version):
+    """Load every simulation joined to its employee, once per dataset version.
+    
+    All dashboard analyses are pandas groupbys over this frame.
+    """
+    query = '''
+        SELECT ps.*, e.employee_code, e.department, e.security_training_score
+        FROM phishing_simulations ps
+        LEFT JOIN employees e USING(employee_id)
+    '''
+    df = _read_query(db_path, query, dtype=FACT_DTYPES)
+    df['day_of_week'] = pd.Categorical.from_codes(df['day_of_week'], dtype=DAY_OF_WEEK_DTYPE)
+    return df
+
+@st.cache_data(ttl=3600)
+def cached_time_analysis(db_path, data_version):
+    """Get time pattern analysis"""
+    df = cached_fact_frame(db_path, data_version)
+    return _click_rate_table(df, ['hour_of_day', 'day_of_week'], 'total_simulations', min_count=3)
+
+@st.cache_data(ttl=3600)
+def cached_device_analysis(db_path, data_version):
+    """Get device and location analysis"""
+    df = cached_fact_frame(db_path, data_version)
+    return _click_rate_table(df, ['device_type', 'location'], 'total_simulations')
+
+@st.cache_data(ttl=3600)
+def cached_department_analysis(db_path, data_version):
+    """Get department vulnerability analysis"""
+    df = cached_fact_frame(db_path, data_version)
+    result = df.groupby('department', observed=True).agg(
+        employee_count=('employee_id', 'nunique'),
+        total_simulations=('clicked_link', 'size'),
+        click_rate=('clicked_link', 'mean'),
+        credential_rate=('provided_credentials', 'mean'),
+        avg_training_score=('security_training_score', 'mean'),
+    ).reset_index()
+    result[['click_rate', 'credential_rate']] = _round1(100.0 * result[['click_rate', 'credential_rate']])
+    result['avg_training_score'] = _round1(result['avg_training_score'])
+    return result.sort_values('click_rate', ascending=False, kind='stable').reset_index(drop=True)
+
+@st.cache_data(ttl=3600)
+def cached_high_risk_scenarios(db_path, data_version):
+    """Get high risk combinations"""
+    df = cached_fact_frame(db_path, data_version)
+    result = _click_rate_table(df, ['hour_of_day', 'day_of_week', 'device_type', 'location'],
+                               'simulations', min_count=2)
+    return result.sort_values('click_rate', ascending=False, kind='stable').head(10).reset_index(drop=True)
+
+@st.cache_data(ttl=3600)
+def cached_employee_risks(db_path, data_version):
+    """Get employee risk profiles"""
+    df = cached_fact_frame(db_path, data_version)
+    df = df[df['employee_code'].notna()]
+    result = df.groupby('employee_id').agg(
+        employee_code=('employee_code', 'first'),
+        department=('department', 'first'),
+        security_training_score=('security_training_score', 'first'),
+        total_simulations=('clicked_link', 'size'),
+        times_clicked=('clicked_link', 'sum'),
+    ).reset_index(drop=True)
+    result['personal_click_rate'] = _round1(100.0 * result['times_clicked'] / result['total_simulations'])
+    result = result[result['times_clicked'] >= 1]
+    # Partial selection of the top 15 rather than sorting every employee
+    return result.nlargest(15, 'personal_click_rate', keep='first').reset_index(drop=True)
+
+def heatmap_chart(pivot, title, xlabel=None, ylabel=None, height=400):
+    """Build a click-rate heatmap spec; the browser does the rendering"""
+    import altair as alt
+    
+    x_name, y_name = pivot.columns.name, pivot.index.name
+    cells = pivot.stack().rename('click_rate').reset_index()
+    cells[[x_name, y_name]] = cells[[x_name, y_name]].astype(str)
+    
+    base = alt.Chart(cells, title=title).encode(
+        x=alt.X(f'{x_name}:O', sort=[str(c) for c in pivot.columns], title=xlabel),
+        y=alt.Y(f'{y_name}:O', sort=[str(i) for i in pivot.index], title=ylabel),
+    )
+    heat = base.mark_rect().encode(
+        color=alt.Color('click_rate:Q', scale=alt.Scale(scheme='yelloworangered'),
+                        title='Click Rate (%)'),
+        tooltip=[x_name, y_name, alt.Tooltip('click_rate:Q', format='.1f')],
+    )
+    labels = base.mark_text(fontSize=10).encode(text=alt.Text('click_rate:Q', format='.1f'))
+    return (heat + labels).properties(height=height)
+
+# Bar charts are rasterized once per dataset version and served as cached PNG bytes.
+# The chart data is derived from that version, so it is passed underscore-prefixed
+# and Streamlit keys the cache on (db_path, data_version) without hashing the frame.
+# matplotlib is imported on first render so sessions that never draw one skip it.
+def _figure_png(fig):
+    import io
+    import matplotlib.pyplot as plt
+    
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+@st.cache_data(ttl=3600)
+def render_device_bar_png(_device_summary, db_path, data_version):
+    """Render the average click rate per device type"""
+    import matplotlib.pyplot as plt
+    
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.barh(_device_summary['device_type'], _device_summary['click_rate'], color='#FF6B6B')
+    ax.set_xlabel('Average Click Rate (%)', fontsize=12)
+    ax.set_title('Average Click Rate by Device Type', fontsize=14, fontweight='bold')
+    ax.grid(axis='x', alpha=0.3)
+    return _figure_png(fig)
+
+@st.cache_data(ttl=3600)
+def render_department_bar_png(_dept_data, db_path, data_version):
+    """Render click and credential rates per department"""
+    import matplotlib.pyplot as plt
+    
+    fig, ax = plt.subplots(figsize=(8, 6))
+    x = range(len(_dept_data))
+    ax.bar(x, _dept_data['click_rate'], color='#FF6B6B', alpha=0.7, label='Click Rate')
+    ax.bar(x, _dept_data['credential_rate'], color='#EE5A6F', alpha=0.9, label='Credential Rate')
+    
+    ax.set_xticks(x)
+    ax.set_xticklabels(_dept_data['department'], rotation=45, ha='right')
+    ax.set_ylabel('Rate (%)', fontsize=12)
+    ax.set_title('Department Vulnerability Comparison', fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(axis='y', alpha=0.3)
+    return _figure_png(fig)
+
+@st.cache_resource
+def _version_watcher(db_path):
+    """One long-lived, read-only connection per database, shared by every session"""
+    return sqlite3.connect(db_path, check_same_thread=False), threading.Lock()
+
+def dataset_version(db_path):
+    """PRAGMA data_version of the shared watcher connection, used as the cache key.
+    
+    The caches are shared by every session in the process, so the key comes from
+    the database rather than from session state. SQLite changes the value each
+    time another connection (any session, or main2.py) commits, and the watcher
+    itself never writes, so every committed change gives a new key.
+    """
+    conn, lock = _version_watcher(db_path)
+    with lock:
+        return conn.execute('PRAGMA data_version').fetchone()[0]
+
+# Sidebar download templates, kept as literals so reruns don't rebuild DataFrames
+EMP_TEMPLATE_CSV = (
+    "employee_code,department,tenure_months,security_training_score\n"
+    "EMP001,Engineering,24,85.5\n"
+    "EMP002,Sales,12,72.0\n"
+)
+
+SIM_TEMPLATE_CSV = (
+    "employee_code,timestamp,device_type,location,clicked_link,provided_credentials,time_to_click_seconds\n"
+    "EMP001,2024-01-15 09:30:00,Desktop,Office,True,False,45.0\n"
+    "EMP002,2024-01-16 14:45:00,Mobile,Coffee Shop,False,False,\n"
+)
+
+# Shared by setup_database and the day_of_week migration
+SIMULATIONS_TABLE_DDL = '''
+    CREATE TABLE {if_not_exists}{table} (
+        simulation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        timestamp TIMESTAMP NOT NULL,
+        day_of_week INTEGER NOT NULL,
+        hour_of_day INTEGER NOT NULL,
+        device_type TEXT NOT NULL,
+        location TEXT NOT NULL,
+        clicked_link BOOLEAN NOT NULL,
+        provided_credentials BOOLEAN NOT NULL,
+        time_to_click_seconds INTEGER,
+        FOREIGN KEY (employee_id) REFERENCES employees(employee_id)
+    );
+'''
+
+# Indexes dropped around bulk loads and rebuilt once the rows are in
+INDEXES = {
+    'idx_employee_dept': 'employees(department)',
+    'idx_simulation_time': 'phishing_simulations(timestamp)',
+    'idx_simulation_employee': 'phishing_simulations(employee_id)',
+    'idx_simulation_hour_day': 'phishing_simulations(hour_of_day, day_of_week)',
+    'idx_simulation_device': 'phishing_simulations(device_type)',
+    'idx_simulation_clicked': 'phishing_simulations(clicked_link)',
+}
+
+# Smaller CSV imports keep the indexes; rebuilding them would cost more than it saves
+BULK_INDEX_THRESHOLD = 1000
+
+# Spellings of a true flag accepted in CSV files and prompts (compared lowercased)
+_TRUE = frozenset({'true', '1', 'yes', 'y', 't'})
+
+# Rows per multi-row INSERT; 100 rows x 9 columns stays under SQLite's 999 parameter limit
+INSERT_BATCH_ROWS = 100
+
+def _insert_batched(cursor, table, columns, rows, verb='INSERT'):
+    """Insert rows using one multi-row VALUES statement per batch"""
+    placeholders = '(' + ', '.join(['?'] * len(columns)) + ')'
+    insert_sql = f"{verb} INTO {table} ({', '.join(columns)}) VALUES "
+    batch_sql = insert_sql + ', '.join([placeholders] * INSERT_BATCH_ROWS)
+    
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, INSERT_BATCH_ROWS))
+        if len(batch) < INSERT_BATCH_ROWS:
+            # Tail goes through the single-row statement
+            cursor.executemany(insert_sql + placeholders, batch)
+            return
+        cursor.execute(batch_sql, list(chain.from_iterable(batch)))
+
+def _frame_rows(frame):
+    """Rows of a DataFrame as tuples of Python values, with missing values as None"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).itertuples(index=False, name=None)
+
 class HumanWeaknessAnalyzer:
     def __init__(self, db_name='security_behavior.db'):
         self.db_name = db_name
@@ -45,7 +342,14 @@ class HumanWeaknessAnalyzer:
         
     def setup_database(self):
         """Create database and tables"""
-        self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        # Autocommit mode: writes are grouped with explicit BEGIN/COMMIT in _transaction()
+        self.conn = sqlite3.connect(self.db_name, check_same_thread=False,
+                                    isolation_level=None, cached_statements=256)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.conn.execute('PRAGMA cache_size=-64000')
+        self.conn.execute('PRAGMA mmap_size=268435456')
         cursor = self.conn.cursor()
         
         cursor.executescript('''
@@ -57,43 +361,89 @@ class HumanWeaknessAnalyzer:
                 security_training_score REAL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
-
-            CREATE TABLE IF NOT EXISTS phishing_simulations (
-                simulation_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                timestamp TIMESTAMP NOT NULL,
-                day_of_week TEXT NOT NULL,
-                hour_of_day INTEGER NOT NULL,
-                device_type TEXT NOT NULL,
-                location TEXT NOT NULL,
-                clicked_link BOOLEAN NOT NULL,
-                provided_credentials BOOLEAN NOT NULL,
-                time_to_click_seconds INTEGER,
-                FOREIGN KEY (employee_id) REFERENCES employees(employee_id)
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_employee_dept ON employees(department);
-            CREATE INDEX IF NOT EXISTS idx_simulation_time ON phishing_simulations(timestamp);
-            CREATE INDEX IF NOT EXISTS idx_simulation_employee ON phishing_simulations(employee_id);
-            CREATE INDEX IF NOT EXISTS idx_simulation_hour_day ON phishing_simulations(hour_of_day, day_of_week);
-            CREATE INDEX IF NOT EXISTS idx_simulation_device ON phishing_simulations(device_type);
-            CREATE INDEX IF NOT EXISTS idx_simulation_clicked ON phishing_simulations(clicked_link);
-        ''')
-        
-        self.conn.commit()
+        ''' + SIMULATIONS_TABLE_DDL.format(if_not_exists='IF NOT EXISTS ', table='phishing_simulations'))
+        self._migrate_simulations_table()
+        self._create_indexes()
         return True
     
+    def _migrate_simulations_table(self):
+        """Rewrite a simulations table written in another layout into the dashboard's.
+        
+        Older databases store day names; main.py stores device and
+        location as integer codes and timestamps as epoch seconds.
+        """
+        columns = {row[1]: row[2] for row in self.conn.execute('PRAGMA table_info(phishing_simulations)')}
+        
+        timestamp = 'timestamp'
+        if columns.get('timestamp') == 'INTEGER':
+            timestamp = "datetime(timestamp, 'unixepoch')"
+        
+        day_of_week = 'day_of_week'
+        if columns.get('day_of_week') == 'TEXT':
+            day_codes = ' '.join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(DAY_OF_WEEK_DTYPE.categories))
+            day_of_week = (f"CASE day_of_week {day_codes} "
+                           f"ELSE (CAST(strftime('%w', {timestamp}) AS INTEGER) + 6) % 7 END")
+        
+        decoded = {}
+        for column, names in (('device_type', DEVICE_TYPES), ('location', LOCATIONS)):
+            decoded[column] = column
+            if columns.get(column) == 'INTEGER':
+                cases = ' '.join(f"WHEN {code} THEN '{name}'" for code, name in enumerate(names))
+                decoded[column] = f"CASE {column} {cases} END"
+        
+        if (timestamp, day_of_week) == ('timestamp', 'day_of_week') and list(decoded.values()) == list(decoded):
+            return
+        
+        with self._transaction():
+            self.conn.execute(SIMULATIONS_TABLE_DDL.format(if_not_exists='', table='phishing_simulations_new'))
+            self.conn.execute(f'''
+                INSERT INTO phishing_simulations_new
+                SELECT simulation_id, employee_id, {timestamp}, {day_of_week},
+                       hour_of_day, {decoded['device_type']}, {decoded['location']}, clicked_link,
+                       provided_credentials, time_to_click_seconds
+                FROM phishing_simulations
+            ''')
+            self.conn.execute('DROP TABLE phishing_simulations')
+            self.conn.execute('ALTER TABLE phishing_simulations_new RENAME TO phishing_simulations')
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the block as one explicit transaction, rolling back on error"""
+        self.conn.execute('BEGIN')
+        try:
+            yield
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+    
+    def _create_indexes(self):
+        """Create the lookup indexes (no-op for ones that already exist)"""
+        for name, target in INDEXES.items():
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+    
+    def _drop_indexes(self):
+        """Drop the lookup indexes so bulk inserts skip per-row B-tree updates"""
+        for name in INDEXES:
+            self.conn.execute(f'DROP INDEX IF EXISTS {name}')
+    
+    @contextmanager
+    def _deferred_indexes(self, enabled=True):
+        """Drop the indexes for a bulk insert and rebuild them afterwards, even on failure.
+        
+        Enter before the transaction so the rebuild runs after COMMIT/ROLLBACK.
+        """
+        if enabled:
+            self._drop_indexes()
+        try:
+            yield
+        finally:
+            if enabled:
+                self._create_indexes()
+    
     def generate_sample_data(self, num_employees=200, num_simulations=5000):
         """Generate realistic phishing simulation data"""
-        cursor = self.conn.cursor()
-        
-        # Clear existing data
-        cursor.execute('DELETE FROM phishing_simulations')
-        cursor.execute('DELETE FROM employees')
-        
         departments = ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations']
-        devices = ['Desktop', 'Mobile', 'Tablet']
-        locations = ['Office', 'Remote', 'Coffee Shop', 'Airport']
         
         # Insert employees
         employees = []
@@ -103,58 +453,62 @@ class HumanWeaknessAnalyzer:
             training_score = random.uniform(60, 100)
             employees.append((f"EMP{i:04d}", dept, tenure, training_score))
         
-        cursor.executemany('''
-            INSERT INTO employees (employee_code, department, tenure_months, security_training_score)
-            VALUES (?, ?, ?, ?)
-        ''', employees)
-        
-        # Insert phishing simulations
+        # Insert phishing simulations, drawing every column as one NumPy array
+        rng = np.random.default_rng()
         start_date = datetime.now() - timedelta(days=90)
-        simulations = []
-        
-        for i in range(num_simulations):
-            emp_id = random.randint(1, num_employees)
-            
-            days_offset = random.randint(0, 89)
-            hour = random.choices(
-                range(24),
-                weights=[2,1,1,1,1,3,5,8,10,12,10,15,20,12,10,18,22,15,8,5,4,3,2,2]
-            )[0]
-            
-            timestamp = start_date + timedelta(days=days_offset, hours=hour, minutes=random.randint(0,59))
-            day_of_week = timestamp.strftime('%A')
-            
-            device = random.choices(devices, weights=[60, 30, 10])[0]
-            location = random.choice(locations)
-            
-            risk_score = 0.15
-            if hour >= 12 and hour <= 13: risk_score += 0.10
-            if hour >= 16 and hour <= 18: risk_score += 0.15
-            if hour >= 22 or hour <= 6: risk_score += 0.08
-            if day_of_week == 'Monday': risk_score += 0.08
-            if day_of_week == 'Friday': risk_score += 0.05
-            if device == 'Mobile': risk_score += 0.12
-            if device == 'Tablet': risk_score += 0.08
-            if location in ['Coffee Shop', 'Airport']: risk_score += 0.10
+        hour_weights = np.array([2,1,1,1,1,3,5,8,10,12,10,15,20,12,10,18,22,15,8,5,4,3,2,2], dtype=float)
+        
+        emp_ids = rng.integers(1, num_employees + 1, num_simulations)
+        days_offset = rng.integers(0, 90, num_simulations)
+        hours = rng.choice(24, size=num_simulations, p=hour_weights / hour_weights.sum())
+        minutes = rng.integers(0, 60, num_simulations)
+        device_idx = rng.choice(len(DEVICE_TYPES), size=num_simulations, p=[0.6, 0.3, 0.1])
+        location_idx = rng.integers(0, len(LOCATIONS), num_simulations)
+        
+        timestamps = (pd.Timestamp(start_date)
+                      + pd.to_timedelta(days_offset, unit='D')
+                      + pd.to_timedelta(hours, unit='h')
+                      + pd.to_timedelta(minutes, unit='m'))
+        day_of_week = timestamps.dayofweek
+        
+        risk_score = (0.15
+                      + 0.10 * ((hours >= 12) & (hours <= 13))
+                      + 0.15 * ((hours >= 16) & (hours <= 18))
+                      + 0.08 * ((hours >= 22) | (hours <= 6))
+                      + 0.08 * (day_of_week == 0)    # Monday
+                      + 0.05 * (day_of_week == 4)    # Friday
+                      + 0.12 * (device_idx == DEVICE_TYPES.index('Mobile'))
+                      + 0.08 * (device_idx == DEVICE_TYPES.index('Tablet'))
+                      + 0.10 * np.isin(location_idx, [LOCATIONS.index('Coffee Shop'), LOCATIONS.index('Airport')]))
+        
+        clicked = rng.random(num_simulations) < risk_score
+        provided_credentials = clicked & (rng.random(num_simulations) < 0.35)
+        time_to_click = np.where(clicked, rng.integers(5, 301, num_simulations), None)
+        
+        # Stream rows to executemany from pre-built column lists instead of a list of tuples
+        simulations = zip(
+            emp_ids.tolist(), timestamps.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+            day_of_week.tolist(), hours.tolist(),
+            np.array(DEVICE_TYPES)[device_idx].tolist(), np.array(LOCATIONS)[location_idx].tolist(),
+            clicked.tolist(), provided_credentials.tolist(), time_to_click.tolist()
+        )
+        
+        # Replace the dataset in a single transaction
+        with self._deferred_indexes(), self._transaction():
+            cursor = self.conn.cursor()
+            cursor.execute('DELETE FROM phishing_simulations')
+            cursor.execute('DELETE FROM employees')
             
-            clicked = random.random() < risk_score
-            provided_credentials = clicked and random.random() < 0.35
-            time_to_click = random.randint(5, 300) if clicked else None
+            cursor.executemany('''
+                INSERT INTO employees (employee_code, department, tenure_months, security_training_score)
+                VALUES (?, ?, ?, ?)
+            ''', employees)
             
-            simulations.append((
-                emp_id, timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                day_of_week, hour, device, location,
-                clicked, provided_credentials, time_to_click
-            ))
-        
-        cursor.executemany('''
-            INSERT INTO phishing_simulations 
-            (employee_id, timestamp, day_of_week, hour_of_day, 
-             device_type, location, clicked_link, provided_credentials, time_to_click_seconds)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', simulations)
-        
-        self.conn.commit()
+            _insert_batched(cursor, 'phishing_simulations', [
+                'employee_id', 'timestamp', 'day_of_week', 'hour_of_day',
+                'device_type', 'location', 'clicked_link', 'provided_credentials', 'time_to_click_seconds'
+            ], simulations)
+        
         return num_employees, num_simulations
     
     def import_employees_csv(self, uploaded_file):
@@ -172,16 +526,13 @@ class HumanWeaknessAnalyzer:
             if 'security_training_score' not in df.columns:
                 df['security_training_score'] = 75.0
             
-            cursor = self.conn.cursor()
-            for _, row in df.iterrows():
-                cursor.execute('''
-                    INSERT OR IGNORE INTO employees 
-                    (employee_code, department, tenure_months, security_training_score)
-                    VALUES (?, ?, ?, ?)
-                ''', (row['employee_code'], row['department'], 
-                      row['tenure_months'], row['security_training_score']))
+            columns = ['employee_code', 'department', 'tenure_months', 'security_training_score']
+            
+            # OR IGNORE skips duplicate codes and rows that break a NOT NULL constraint
+            with self._deferred_indexes(len(df) > BULK_INDEX_THRESHOLD), self._transaction():
+                _insert_batched(self.conn.cursor(), 'employees', columns, _frame_rows(df[columns]),
+                                verb='INSERT OR IGNORE')
             
-            self.conn.commit()
             return True, f"Imported {len(df)} employees"
             
         except Exception as e:
@@ -202,154 +553,59 @@ class HumanWeaknessAnalyzer:
             if 'time_to_click_seconds' not in df.columns:
                 df['time_to_click_seconds'] = None
             
+            # Resolve employee codes in one query; rows for unknown employees are skipped
             cursor = self.conn.cursor()
-            imported = 0
+            employee_ids = dict(cursor.execute('SELECT employee_code, employee_id FROM employees').fetchall())
+            df['employee_id'] = df['employee_code'].astype(str).map(employee_ids)
+            df = df[df['employee_id'].notna()].copy()
+            df['employee_id'] = df['employee_id'].astype(int)
             
-            for _, row in df.iterrows():
-                cursor.execute('SELECT employee_id FROM employees WHERE employee_code = ?', 
-                             (row['employee_code'],))
-                result = cursor.fetchone()
-                
-                if not result:
-                    continue
-                
-                employee_id = result[0]
-                ts = pd.to_datetime(row['timestamp'])
-                day_of_week = ts.strftime('%A')
-                hour_of_day = ts.hour
-                
-                clicked = str(row['clicked_link']).lower() in ['true', '1', 'yes']
-                provided_creds = str(row['provided_credentials']).lower() in ['true', '1', 'yes']
-                
-                cursor.execute('''
-                    INSERT INTO phishing_simulations 
-                    (employee_id, timestamp, day_of_week, hour_of_day, device_type, 
-                     location, clicked_link, provided_credentials, time_to_click_seconds)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (employee_id, ts.strftime('%Y-%m-%d %H:%M:%S'), day_of_week, 
-                      hour_of_day, row['device_type'], row['location'], 
-                      clicked, provided_creds, row.get('time_to_click_seconds')))
-                
-                imported += 1
+            ts = pd.to_datetime(df['timestamp'], format='mixed')
+            df['timestamp'] = ts.dt.strftime('%Y-%m-%d %H:%M:%S')
+            df['day_of_week'] = ts.dt.dayofweek
+            df['hour_of_day'] = ts.dt.hour
+            
+            df['clicked_link'] = df['clicked_link'].astype(str).str.lower().isin(_TRUE)
+            df['provided_credentials'] = df['provided_credentials'].astype(str).str.lower().isin(_TRUE)
+            
+            columns = ['employee_id', 'timestamp', 'day_of_week', 'hour_of_day', 'device_type',
+                       'location', 'clicked_link', 'provided_credentials', 'time_to_click_seconds']
+            with self._deferred_indexes(len(df) > BULK_INDEX_THRESHOLD), self._transaction():
+                _insert_batched(cursor, 'phishing_simulations', columns, _frame_rows(df[columns]))
+            imported = len(df)
             
-            self.conn.commit()
             return True, f"Imported {imported} simulations"
             
         except Exception as e:
             return False, str(e)
     
+    def data_version(self):
+        """Current cache key for this analyzer's database"""
+        return dataset_version(self.db_name)
+    
     def get_summary_stats(self):
         """Get summary statistics"""
-        cursor = self.conn.cursor()
-        
-        stats = {}
-        
-        cursor.execute('SELECT COUNT(*) FROM employees')
-        stats['total_employees'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM phishing_simulations')
-        stats['total_simulations'] = cursor.fetchone()[0]
-        
-        if stats['total_simulations'] > 0:
-            cursor.execute('''
-                SELECT 
-                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1)
-                FROM phishing_simulations
-            ''')
-            stats['click_rate'] = cursor.fetchone()[0]
-            
-            cursor.execute('''
-                SELECT 
-                    ROUND(100.0 * SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) / COUNT(*), 1)
-                FROM phishing_simulations
-            ''')
-            stats['credential_rate'] = cursor.fetchone()[0]
-        else:
-            stats['click_rate'] = 0
-            stats['credential_rate'] = 0
-        
-        return stats
+        return cached_summary_stats(self.db_name, self.data_version())
     
     def get_time_analysis(self):
         """Get time pattern analysis"""
-        query = '''
-            SELECT 
-                hour_of_day,
-                day_of_week,
-                COUNT(*) as total_simulations,
-                ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate
-            FROM phishing_simulations
-            GROUP BY hour_of_day, day_of_week
-            HAVING total_simulations >= 3
-        '''
-        return pd.read_sql_query(query, self.conn)
+        return cached_time_analysis(self.db_name, self.data_version())
     
     def get_device_analysis(self):
         """Get device and location analysis"""
-        query = '''
-            SELECT 
-                device_type,
-                location,
-                COUNT(*) as total_simulations,
-                ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate
-            FROM phishing_simulations
-            GROUP BY device_type, location
-        '''
-        return pd.read_sql_query(query, self.conn)
+        return cached_device_analysis(self.db_name, self.data_version())
     
     def get_department_analysis(self):
         """Get department vulnerability analysis"""
-        query = '''
-            SELECT 
-                e.department,
-                COUNT(DISTINCT e.employee_id) as employee_count,
-                COUNT(ps.simulation_id) as total_simulations,
-                ROUND(100.0 * SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as click_rate,
-                ROUND(100.0 * SUM(CASE WHEN ps.provided_credentials THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as credential_rate,
-                ROUND(AVG(e.security_training_score), 1) as avg_training_score
-            FROM employees e
-            JOIN phishing_simulations ps ON e.employee_id = ps.employee_id
-            GROUP BY e.department
-            ORDER BY click_rate DESC
-        '''
-        return pd.read_sql_query(query, self.conn)
+        return cached_department_analysis(self.db_name, self.data_version())
     
     def get_high_risk_scenarios(self):
         """Get high risk combinations"""
-        query = '''
-            SELECT 
-                hour_of_day,
-                day_of_week,
-                device_type,
-                location,
-                COUNT(*) as simulations,
-                ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate
-            FROM phishing_simulations
-            GROUP BY hour_of_day, day_of_week, device_type, location
-            HAVING simulations >= 2
-            ORDER BY click_rate DESC
-            LIMIT 10
-        '''
-        return pd.read_sql_query(query, self.conn)
+        return cached_high_risk_scenarios(self.db_name, self.data_version())
     
     def get_employee_risks(self):
         """Get employee risk profiles"""
-        query = '''
-            SELECT 
-                e.employee_code,
-                e.department,
-                e.security_training_score,
-                COUNT(ps.simulation_id) as total_simulations,
-                SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) as times_clicked,
-                ROUND(100.0 * SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as personal_click_rate
-            FROM employees e
-            JOIN phishing_simulations ps ON e.employee_id = ps.employee_id
-            GROUP BY e.employee_id
-            HAVING times_clicked >= 1
-            ORDER BY personal_click_rate DESC
-            LIMIT 15
-        '''
-        return pd.read_sql_query(query, self.conn)
+        return cached_employee_risks(self.db_name, self.data_version())
     
     def close(self):
         if self.conn:
@@ -413,35 +669,18 @@ with st.sidebar:
         st.markdown("---")
         st.markdown("**Need templates?**")
         
-        emp_template = pd.DataFrame({
-            'employee_code': ['EMP001', 'EMP002'],
-            'department': ['Engineering', 'Sales'],
-            'tenure_months': [24, 12],
-            'security_training_score': [85.5, 72.0]
-        })
-        
-        sim_template = pd.DataFrame({
-            'employee_code': ['EMP001', 'EMP002'],
-            'timestamp': ['2024-01-15 09:30:00', '2024-01-16 14:45:00'],
-            'device_type': ['Desktop', 'Mobile'],
-            'location': ['Office', 'Coffee Shop'],
-            'clicked_link': [True, False],
-            'provided_credentials': [False, False],
-            'time_to_click_seconds': [45, None]
-        })
-        
         col1, col2 = st.columns(2)
         with col1:
             st.download_button(
                 "📥 Employees",
-                emp_template.to_csv(index=False),
+                EMP_TEMPLATE_CSV,
                 "employee_template.csv",
                 "text/csv"
             )
         with col2:
             st.download_button(
                 "📥 Simulations",
-                sim_template.to_csv(index=False),
+                SIM_TEMPLATE_CSV,
                 "simulation_template.csv",
                 "text/csv"
             )
@@ -463,7 +702,6 @@ with st.sidebar:
                         INSERT INTO employees (employee_code, department, tenure_months, security_training_score)
                         VALUES (?, ?, ?, ?)
                     ''', (emp_code, dept, tenure, training))
-                    analyzer.conn.commit()
                     st.success(f"✅ Added {emp_code}")
                     st.session_state.data_loaded = True
                 except sqlite3.IntegrityError:
@@ -552,20 +790,11 @@ with tab2:
     if not time_data.empty:
         # Create heatmap
         pivot = time_data.pivot_table(index='hour_of_day', columns='day_of_week', 
-                                     values='click_rate', fill_value=0)
-        
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        existing_days = [day for day in day_order if day in pivot.columns]
-        pivot = pivot[existing_days]
-        
-        fig, ax = plt.subplots(figsize=(12, 8))
-        sns.heatmap(pivot, annot=True, fmt='.1f', cmap='YlOrRd', 
-                   cbar_kws={'label': 'Click Rate (%)'}, ax=ax)
-        ax.set_title('Click Rate by Hour and Day of Week', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Day of Week', fontsize=12)
-        ax.set_ylabel('Hour of Day', fontsize=12)
+                                     values='click_rate', fill_value=0, observed=True)
         
-        st.pyplot(fig)
+        st.altair_chart(heatmap_chart(pivot, 'Click Rate by Hour and Day of Week',
+                                      xlabel='Day of Week', ylabel='Hour of Day', height=600),
+                        use_container_width=True)
         
         # Show data table
         with st.expander("📋 View Detailed Data"):
@@ -586,27 +815,17 @@ with tab3:
         with col1:
             # Device heatmap
             pivot = device_data.pivot_table(index='device_type', columns='location', 
-                                           values='click_rate', fill_value=0)
+                                           values='click_rate', fill_value=0, observed=True)
             
-            fig, ax = plt.subplots(figsize=(8, 5))
-            sns.heatmap(pivot, annot=True, fmt='.1f', cmap='YlOrRd',
-                       cbar_kws={'label': 'Click Rate (%)'}, ax=ax)
-            ax.set_title('Click Rate by Device and Location', fontsize=14, fontweight='bold')
-            
-            st.pyplot(fig)
+            st.altair_chart(heatmap_chart(pivot, 'Click Rate by Device and Location', height=300),
+                            use_container_width=True)
         
         with col2:
             # Device comparison bar chart
-            device_summary = device_data.groupby('device_type')['click_rate'].mean().reset_index()
+            device_summary = device_data.groupby('device_type', observed=True)['click_rate'].mean().reset_index()
             device_summary = device_summary.sort_values('click_rate', ascending=True)
             
-            fig, ax = plt.subplots(figsize=(8, 5))
-            ax.barh(device_summary['device_type'], device_summary['click_rate'], color='#FF6B6B')
-            ax.set_xlabel('Average Click Rate (%)', fontsize=12)
-            ax.set_title('Average Click Rate by Device Type', fontsize=14, fontweight='bold')
-            ax.grid(axis='x', alpha=0.3)
-            
-            st.pyplot(fig)
+            st.image(render_device_bar_png(device_summary, analyzer.db_name, analyzer.data_version()))
         
         # Show data table
         with st.expander("📋 View Detailed Data"):
@@ -625,19 +844,7 @@ with tab4:
         dept_data = analyzer.get_department_analysis()
         
         if not dept_data.empty:
-            fig, ax = plt.subplots(figsize=(8, 6))
-            x = range(len(dept_data))
-            ax.bar(x, dept_data['click_rate'], color='#FF6B6B', alpha=0.7, label='Click Rate')
-            ax.bar(x, dept_data['credential_rate'], color='#EE5A6F', alpha=0.9, label='Credential Rate')
-            
-            ax.set_xticks(x)
-            ax.set_xticklabels(dept_data['department'], rotation=45, ha='right')
-            ax.set_ylabel('Rate (%)', fontsize=12)
-            ax.set_title('Department Vulnerability Comparison', fontsize=14, fontweight='bold')
-            ax.legend()
-            ax.grid(axis='y', alpha=0.3)
-            
-            st.pyplot(fig)
+            st.image(render_department_bar_png(dept_data, analyzer.db_name, analyzer.data_version()))
             
             with st.expander("📋 View Department Data"):
                 st.dataframe(dept_data, use_container_width=True, hide_index=True)
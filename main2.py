@@ -2,22 +2,102 @@ import sqlite3
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
+import sys
+import io
+from contextlib import contextmanager
+from itertools import chain
+
+# day_of_week is stored as the weekday code (Monday = 0) and named when results are read
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Insert statements shared by the CSV and manual paths; sqlite3 keeps each one prepared
+# in the connection's statement cache, so repeated adds skip re-parsing the SQL
+EMPLOYEE_COLUMNS = ['employee_code', 'department', 'tenure_months', 'security_training_score']
+EMPLOYEE_INSERT_SQL = f"INSERT INTO employees ({', '.join(EMPLOYEE_COLUMNS)}) VALUES (?, ?, ?, ?)"
+EMPLOYEE_IMPORT_SQL = EMPLOYEE_INSERT_SQL.replace('INSERT', 'INSERT OR IGNORE', 1)
+
+SIMULATION_COLUMNS = ['employee_id', 'timestamp', 'day_of_week', 'hour_of_day', 'device_type',
+                      'location', 'clicked_link', 'provided_credentials', 'time_to_click_seconds']
+SIMULATION_INSERT_SQL = (f"INSERT INTO phishing_simulations ({', '.join(SIMULATION_COLUMNS)}) "
+                         f"VALUES ({', '.join(['?'] * len(SIMULATION_COLUMNS))})")
+
+# Repeated string columns of a simulations CSV, read as categoricals: the employee
+# lookup then maps each distinct code once, and rows share one string per value.
+# This also keeps numeric codes such as 1001 as strings, matching employees.employee_code
+SIMULATION_CSV_DTYPES = dict.fromkeys(['employee_code', 'device_type', 'location'], 'category')
+
+# Spellings of a true flag accepted in CSV files and prompts (compared lowercased)
+_TRUE = frozenset({'true', '1', 'yes', 'y', 't'})
+
+# Without a display (or on CI) the figure is only saved, on the non-interactive Agg backend
+HEADLESS = bool(os.environ.get('CI')) or (
+    sys.platform.startswith('linux')
+    and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY')
+)
+
+# Click rate per hour with one column per day, in the shape the heatmap draws. It reads
+# the combo_summary table run_analysis builds, and is run by create_visualizations
+TIME_PIVOT_QUERY = '''
+    SELECT 
+        hour_of_day,
+        {}
+    FROM combo_summary
+    GROUP BY hour_of_day
+    ORDER BY hour_of_day
+'''.format(',\n        '.join(
+    f"ROUND(100.0 * SUM(CASE WHEN day_of_week = {code} THEN clicks END) "
+    f"/ SUM(CASE WHEN day_of_week = {code} THEN simulations END), 1) as {name}"
+    for code, name in enumerate(DAY_NAMES)))
+
+# Day columns can come back entirely NULL but should still be numeric
+TIME_PIVOT_DTYPES = dict.fromkeys(DAY_NAMES, 'float64')
+
+# The employee, hour/day and device/location indexes also carry the outcome
+# flags, so the analysis GROUP BYs are answered from the index alone; the
+# hour/day one spans all four combination columns for the summary scan
+INDEXES = {
+    'idx_employee_dept': ('employees', 'department'),
+    'idx_simulation_time': ('phishing_simulations', 'timestamp'),
+    'idx_simulation_employee': ('phishing_simulations', 'employee_id, clicked_link, provided_credentials'),
+    'idx_simulation_hour_day': ('phishing_simulations', 'hour_of_day, day_of_week, device_type, location, '
+                                                        'clicked_link, provided_credentials'),
+    'idx_simulation_device': ('phishing_simulations', 'device_type, location, clicked_link, provided_credentials'),
+    'idx_simulation_clicked': ('phishing_simulations', 'clicked_link'),
+}
+
+# Imports smaller than this keep the indexes; rebuilding them would cost more than it saves
+BULK_INDEX_THRESHOLD = 10_000
+
+def _frame_rows(frame):
+    """Rows of a DataFrame as tuples of Python values, with missing values as None"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).itertuples(index=False, name=None)
+
+def _read_simulations_csv(source, **kwargs):
+    """Read simulation rows from a CSV path or buffer, shared by file import and bulk paste"""
+    return pd.read_csv(source, dtype=SIMULATION_CSV_DTYPES, **kwargs)
 
 class HumanWeaknessAnalyzer:
     def __init__(self, db_name='security_behavior.db'):
         self.db_name = db_name
         self.conn = None
+        self._analysis_cache = {}
+        self._figure_axes = None
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         
     def setup_database(self):
         """Create database and tables"""
-        self.conn = sqlite3.connect(self.db_name)
-        cursor = self.conn.cursor()
+        self.conn = self._connect()
+        self._create_tables()
+        self._create_indexes()
         
-        cursor.executescript('''
+        self.conn.commit()
+        self._analysis_cache.clear()
+        print("✓ Database schema created")
+    
+    def _create_tables(self):
+        self.conn.executescript('''
             DROP TABLE IF EXISTS phishing_simulations;
             DROP TABLE IF EXISTS employees;
 
@@ -34,8 +114,8 @@ class HumanWeaknessAnalyzer:
                 simulation_id INTEGER PRIMARY KEY,
                 employee_id INTEGER NOT NULL,
                 timestamp TIMESTAMP NOT NULL,
-                day_of_week TEXT NOT NULL,
-                hour_of_day INTEGER NOT NULL,
+                day_of_week INTEGER NOT NULL CHECK (day_of_week BETWEEN 0 AND 6),
+                hour_of_day INTEGER NOT NULL CHECK (hour_of_day BETWEEN 0 AND 23),
                 device_type TEXT NOT NULL,
                 location TEXT NOT NULL,
                 clicked_link BOOLEAN NOT NULL,
@@ -43,50 +123,68 @@ class HumanWeaknessAnalyzer:
                 time_to_click_seconds INTEGER,
                 FOREIGN KEY (employee_id) REFERENCES employees(employee_id)
             );
-
-            CREATE INDEX idx_employee_dept ON employees(department);
-            CREATE INDEX idx_simulation_time ON phishing_simulations(timestamp);
-            CREATE INDEX idx_simulation_employee ON phishing_simulations(employee_id);
-            CREATE INDEX idx_simulation_hour_day ON phishing_simulations(hour_of_day, day_of_week);
-            CREATE INDEX idx_simulation_device ON phishing_simulations(device_type);
-            CREATE INDEX idx_simulation_clicked ON phishing_simulations(clicked_link);
         ''')
-        
-        self.conn.commit()
-        print("✓ Database schema created")
     
-    def import_employees_csv(self, filepath):
-        """Import employee data from CSV"""
+    def _create_indexes(self, table=None):
+        """Create the lookup indexes, optionally only those on one table (existing ones are kept)"""
+        for name, (index_table, columns) in INDEXES.items():
+            if table in (None, index_table):
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {index_table}({columns})')
+    
+    def _drop_indexes(self, table):
+        """Drop a table's lookup indexes so bulk inserts skip per-row B-tree updates"""
+        for name, (index_table, _) in INDEXES.items():
+            if index_table == table:
+                self.conn.execute(f'DROP INDEX IF EXISTS {name}')
+    
+    @contextmanager
+    def _deferred_indexes(self, table, enabled=True):
+        """Drop a table's indexes for a bulk insert and rebuild them afterwards, even on failure.
+        
+        Enter before the transaction so the rebuild runs after COMMIT/ROLLBACK.
+        """
+        if enabled:
+            self._drop_indexes(table)
         try:
-            df = pd.read_csv(filepath)
-            
-            # Validate required columns
-            required_cols = ['employee_code', 'department']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                print(f"❌ Missing required columns: {missing_cols}")
-                print(f"   Required: employee_code, department")
-                print(f"   Optional: tenure_months, security_training_score")
-                return False
-            
-            # Add default values for optional columns
-            if 'tenure_months' not in df.columns:
-                df['tenure_months'] = 12
-            if 'security_training_score' not in df.columns:
-                df['security_training_score'] = 75.0
-            
-            # Insert into database
-            cursor = self.conn.cursor()
-            for idx, row in df.iterrows():
-                cursor.execute('''
-                    INSERT OR IGNORE INTO employees 
-                    (employee_code, department, tenure_months, security_training_score)
-                    VALUES (?, ?, ?, ?)
-                ''', (row['employee_code'], row['department'], 
-                      row['tenure_months'], row['security_training_score']))
+            yield
+        finally:
+            if enabled:
+                self._create_indexes(table)
+    
+    def import_employees_csv(self, filepath, chunksize=100_000):
+        """Import employee data from CSV, reading it chunksize rows at a time"""
+        try:
+            # Departments repeat, so each chunk holds one string per distinct value
+            with pd.read_csv(filepath, chunksize=chunksize, dtype={'department': 'category'}) as reader:
+                # A header-only file still yields one (empty) chunk
+                first_chunk = next(reader)
+                
+                # Validate required columns (every chunk has the file's header)
+                required_cols = ['employee_code', 'department']
+                missing_cols = [col for col in required_cols if col not in first_chunk.columns]
+                if missing_cols:
+                    print(f"❌ Missing required columns: {missing_cols}")
+                    print(f"   Required: employee_code, department")
+                    print(f"   Optional: tenure_months, security_training_score")
+                    return False
+                
+                cursor = self.conn.cursor()
+                imported = 0
+                
+                # One transaction for the whole file, committed before any index rebuild
+                with self._deferred_indexes('employees', len(first_chunk) >= BULK_INDEX_THRESHOLD), self.conn:
+                    for df in chain([first_chunk], reader):
+                        # Add default values for optional columns
+                        if 'tenure_months' not in df.columns:
+                            df['tenure_months'] = 12
+                        if 'security_training_score' not in df.columns:
+                            df['security_training_score'] = 75.0
+                        
+                        cursor.executemany(EMPLOYEE_IMPORT_SQL, _frame_rows(df[EMPLOYEE_COLUMNS]))
+                        imported += len(df)
             
-            self.conn.commit()
-            print(f"✓ Imported {len(df)} employees from {filepath}")
+            self._analysis_cache.clear()
+            print(f"✓ Imported {imported} employees from {filepath}")
             return True
             
         except FileNotFoundError:
@@ -96,67 +194,28 @@ class HumanWeaknessAnalyzer:
             print(f"❌ Error importing employees: {str(e)}")
             return False
     
-    def import_simulations_csv(self, filepath):
-        """Import phishing simulation data from CSV"""
+    def import_simulations_csv(self, filepath, chunksize=100_000):
+        """Import phishing simulation data from CSV, reading it chunksize rows at a time"""
         try:
-            df = pd.read_csv(filepath)
-            
-            # Validate required columns
-            required_cols = ['employee_code', 'timestamp', 'device_type', 
-                           'location', 'clicked_link']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                print(f"❌ Missing required columns: {missing_cols}")
-                print(f"   Required: employee_code, timestamp, device_type, location, clicked_link")
-                print(f"   Optional: provided_credentials, time_to_click_seconds")
-                return False
-            
-            # Add default values for optional columns
-            if 'provided_credentials' not in df.columns:
-                df['provided_credentials'] = False
-            if 'time_to_click_seconds' not in df.columns:
-                df['time_to_click_seconds'] = None
-            
-            cursor = self.conn.cursor()
-            imported = 0
-            
-            for idx, row in df.iterrows():
-                # Get employee_id from employee_code
-                cursor.execute('SELECT employee_id FROM employees WHERE employee_code = ?', 
-                             (row['employee_code'],))
-                result = cursor.fetchone()
-                
-                if not result:
-                    print(f"⚠️  Employee {row['employee_code']} not found, skipping simulation")
-                    continue
+            with _read_simulations_csv(filepath, chunksize=chunksize) as reader:
+                # A header-only file still yields one (empty) chunk
+                first_chunk = next(reader)
                 
-                employee_id = result[0]
+                # Validate required columns (every chunk has the file's header)
+                if not self._has_simulation_columns(first_chunk):
+                    return False
                 
-                # Parse timestamp
-                try:
-                    ts = pd.to_datetime(row['timestamp'])
-                    day_of_week = ts.strftime('%A')
-                    hour_of_day = ts.hour
-                except:
-                    print(f"⚠️  Invalid timestamp format for row {idx}, skipping")
-                    continue
+                imported = 0
                 
-                # Convert boolean
-                clicked = str(row['clicked_link']).lower() in ['true', '1', 'yes']
-                provided_creds = str(row['provided_credentials']).lower() in ['true', '1', 'yes']
+                # Resolve employee codes from one lookup instead of a SELECT per row
+                employee_ids = self._employee_ids()
                 
-                cursor.execute('''
-                    INSERT INTO phishing_simulations 
-                    (employee_id, timestamp, day_of_week, hour_of_day, device_type, 
-                     location, clicked_link, provided_credentials, time_to_click_seconds)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (employee_id, ts.strftime('%Y-%m-%d %H:%M:%S'), day_of_week, 
-                      hour_of_day, row['device_type'], row['location'], 
-                      clicked, provided_creds, row['time_to_click_seconds']))
-                
-                imported += 1
+                # One transaction for the whole file, committed before any index rebuild
+                with self._deferred_indexes('phishing_simulations', len(first_chunk) >= BULK_INDEX_THRESHOLD), self.conn:
+                    for df in chain([first_chunk], reader):
+                        imported += self._bulk_insert_simulations(df, employee_ids)
             
-            self.conn.commit()
+            self._analysis_cache.clear()
             print(f"✓ Imported {imported} phishing simulations from {filepath}")
             return True
             
@@ -169,6 +228,59 @@ class HumanWeaknessAnalyzer:
             traceback.print_exc()
             return False
     
+    def _has_simulation_columns(self, df):
+        """Check a simulation frame has the required columns, printing what is missing"""
+        required_cols = ['employee_code', 'timestamp', 'device_type', 
+                       'location', 'clicked_link']
+        missing_cols = [col for col in required_cols if col not in df.columns]
+        if missing_cols:
+            print(f"❌ Missing required columns: {missing_cols}")
+            print(f"   Required: employee_code, timestamp, device_type, location, clicked_link")
+            print(f"   Optional: provided_credentials, time_to_click_seconds")
+            return False
+        return True
+    
+    def _employee_ids(self):
+        """Map every employee_code to its employee_id"""
+        return dict(self.conn.execute('SELECT employee_code, employee_id FROM employees').fetchall())
+    
+    def _bulk_insert_simulations(self, df, employee_ids=None):
+        """Convert a frame of CSV rows to table rows and insert them, returning the number inserted
+        
+        The caller owns the transaction, so a whole file or paste commits once.
+        """
+        if employee_ids is None:
+            employee_ids = self._employee_ids()
+        
+        # Add default values for optional columns
+        if 'provided_credentials' not in df.columns:
+            df['provided_credentials'] = False
+        if 'time_to_click_seconds' not in df.columns:
+            df['time_to_click_seconds'] = None
+        
+        df['employee_id'] = df['employee_code'].map(employee_ids)
+        for code in df.loc[df['employee_id'].isna(), 'employee_code']:
+            print(f"⚠️  Employee {code} not found, skipping simulation")
+        df = df[df['employee_id'].notna()]
+        
+        # Parse every timestamp in one pass, each in its own format; unparseable ones come back as NaT
+        ts = pd.to_datetime(df['timestamp'], format='mixed', errors='coerce')
+        for idx in df.index[ts.isna()]:
+            print(f"⚠️  Invalid timestamp format for row {idx}, skipping")
+        df, ts = df[ts.notna()].copy(), ts[ts.notna()]
+        
+        df['employee_id'] = df['employee_id'].astype(int)
+        df['timestamp'] = ts.dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['day_of_week'] = ts.dt.dayofweek
+        df['hour_of_day'] = ts.dt.hour
+        
+        # Convert boolean
+        df['clicked_link'] = df['clicked_link'].astype(str).str.lower().isin(_TRUE)
+        df['provided_credentials'] = df['provided_credentials'].astype(str).str.lower().isin(_TRUE)
+        
+        self.conn.executemany(SIMULATION_INSERT_SQL, _frame_rows(df[SIMULATION_COLUMNS]))
+        return len(df)
+    
     def manual_entry_mode(self):
         """Interactive mode for manual data entry"""
         print("\n" + "="*60)
@@ -180,8 +292,9 @@ class HumanWeaknessAnalyzer:
             print("2. Add Phishing Simulation")
             print("3. View Current Data")
             print("4. Back to Main Menu")
+            print("5. Bulk Paste Simulations (CSV)")
             
-            choice = input("\nSelect option (1-4): ").strip()
+            choice = input("\nSelect option (1-5): ").strip()
             
             if choice == '1':
                 self.add_employee_manual()
@@ -191,6 +304,8 @@ class HumanWeaknessAnalyzer:
                 self.view_current_data()
             elif choice == '4':
                 break
+            elif choice == '5':
+                self.bulk_paste_simulations()
             else:
                 print("Invalid option, try again")
     
@@ -205,11 +320,9 @@ class HumanWeaknessAnalyzer:
         
         try:
             cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO employees (employee_code, department, tenure_months, security_training_score)
-                VALUES (?, ?, ?, ?)
-            ''', (employee_code, department, int(tenure_months), float(training_score)))
+            cursor.execute(EMPLOYEE_INSERT_SQL, (employee_code, department, int(tenure_months), float(training_score)))
             self.conn.commit()
+            self._analysis_cache.clear()
             print(f"✓ Employee {employee_code} added successfully")
         except sqlite3.IntegrityError:
             print(f"❌ Employee {employee_code} already exists")
@@ -257,12 +370,12 @@ class HumanWeaknessAnalyzer:
         
         device_type = input("Device Type (Desktop/Mobile/Tablet): ").strip() or "Desktop"
         location = input("Location (Office/Remote/Coffee Shop/Airport): ").strip() or "Office"
-        clicked_link = input("Clicked Link? (yes/no): ").strip().lower() == 'yes'
+        clicked_link = input("Clicked Link? (yes/no): ").strip().lower() in _TRUE
         provided_credentials = False
         time_to_click = None
         
         if clicked_link:
-            provided_credentials = input("Provided Credentials? (yes/no): ").strip().lower() == 'yes'
+            provided_credentials = input("Provided Credentials? (yes/no): ").strip().lower() in _TRUE
             time_str = input("Time to click in seconds (or press Enter to skip): ").strip()
             if time_str:
                 try:
@@ -271,40 +384,67 @@ class HumanWeaknessAnalyzer:
                     pass
         
         try:
-            cursor.execute('''
-                INSERT INTO phishing_simulations 
-                (employee_id, timestamp, day_of_week, hour_of_day, device_type, 
-                 location, clicked_link, provided_credentials, time_to_click_seconds)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (employee_id, timestamp.strftime('%Y-%m-%d %H:%M:%S'), 
-                  timestamp.strftime('%A'), timestamp.hour, device_type, 
+            cursor.execute(SIMULATION_INSERT_SQL, (employee_id, timestamp.isoformat(sep=' ', timespec='seconds'), 
+                  timestamp.weekday(), timestamp.hour, device_type, 
                   location, clicked_link, provided_credentials, time_to_click))
             self.conn.commit()
+            self._analysis_cache.clear()
             print("✓ Simulation added successfully")
         except Exception as e:
             print(f"❌ Error: {str(e)}")
     
+    def bulk_paste_simulations(self):
+        """Add several phishing simulations pasted as CSV, in a single transaction"""
+        print("\n--- Bulk Paste Simulations ---")
+        print("Paste CSV rows with a header line, then a blank line to finish:")
+        print("  employee_code,timestamp,device_type,location,clicked_link[,provided_credentials,time_to_click_seconds]")
+        
+        lines = []
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                break
+            if not line.strip():
+                break
+            lines.append(line)
+        
+        if len(lines) < 2:
+            print("❌ Nothing to add: paste a header line and at least one row")
+            return
+        
+        try:
+            df = _read_simulations_csv(io.StringIO("\n".join(lines)), skipinitialspace=True)
+            if not self._has_simulation_columns(df):
+                return
+            
+            # One commit for the whole paste instead of one per row
+            with self.conn:
+                added = self._bulk_insert_simulations(df)
+            self._analysis_cache.clear()
+            print(f"✓ Added {added} phishing simulations")
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+    
     def view_current_data(self):
         """Display current data summary"""
         cursor = self.conn.cursor()
         
         print("\n--- Data Summary ---")
         
-        cursor.execute('SELECT COUNT(*) FROM employees')
-        emp_count = cursor.fetchone()[0]
+        # Both counts and the overall click rate in one round trip
+        cursor.execute('''
+            SELECT 
+                (SELECT COUNT(*) FROM employees),
+                COUNT(*),
+                ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1)
+            FROM phishing_simulations
+        ''')
+        emp_count, sim_count, click_rate = cursor.fetchone()
         print(f"Total Employees: {emp_count}")
-        
-        cursor.execute('SELECT COUNT(*) FROM phishing_simulations')
-        sim_count = cursor.fetchone()[0]
         print(f"Total Simulations: {sim_count}")
         
         if sim_count > 0:
-            cursor.execute('''
-                SELECT 
-                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate
-                FROM phishing_simulations
-            ''')
-            click_rate = cursor.fetchone()[0]
             print(f"Overall Click Rate: {click_rate}%")
         
         print("\nRecent Employees:")
@@ -339,19 +479,54 @@ class HumanWeaknessAnalyzer:
         print("  - employee_template.csv")
         print("  - simulation_template.csv")
     
+    def build_analysis_summaries(self):
+        """Aggregate the simulations once per grouping level into temp tables for the analysis queries"""
+        # SQLite has no GROUPING SETS, so the two grouping levels every analysis
+        # rolls up from are each built in a single scan
+        self.conn.executescript('''
+            DROP TABLE IF EXISTS temp.combo_summary;
+            DROP TABLE IF EXISTS temp.employee_summary;
+            
+            CREATE TEMP TABLE combo_summary AS
+            SELECT 
+                hour_of_day,
+                day_of_week,
+                device_type,
+                location,
+                COUNT(*) as simulations,
+                SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) as clicks,
+                SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) as credentials
+            FROM phishing_simulations
+            GROUP BY hour_of_day, day_of_week, device_type, location;
+            
+            CREATE TEMP TABLE employee_summary AS
+            SELECT 
+                e.employee_id,
+                e.employee_code,
+                e.department,
+                e.tenure_months,
+                e.security_training_score,
+                COUNT(ps.simulation_id) as simulations,
+                SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) as clicks,
+                SUM(CASE WHEN ps.provided_credentials THEN 1 ELSE 0 END) as credentials
+            FROM employees e
+            JOIN phishing_simulations ps ON e.employee_id = ps.employee_id
+            GROUP BY e.employee_id;
+        ''')
+    
     def get_analysis_queries(self):
-        """Return all analysis queries"""
+        """Return all analysis queries (they read the tables from build_analysis_summaries)"""
         return {
             'Time Pattern Analysis': '''
                 SELECT 
                     hour_of_day,
                     day_of_week,
-                    COUNT(*) as total_simulations,
-                    SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) as clicks,
-                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate,
-                    SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) as credentials_provided,
-                    ROUND(100.0 * SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) / COUNT(*), 1) as credential_rate
-                FROM phishing_simulations
+                    SUM(simulations) as total_simulations,
+                    SUM(clicks) as clicks,
+                    ROUND(100.0 * SUM(clicks) / SUM(simulations), 1) as click_rate,
+                    SUM(credentials) as credentials_provided,
+                    ROUND(100.0 * SUM(credentials) / SUM(simulations), 1) as credential_rate
+                FROM combo_summary
                 GROUP BY hour_of_day, day_of_week
                 HAVING total_simulations >= 3
                 ORDER BY click_rate DESC
@@ -362,27 +537,28 @@ class HumanWeaknessAnalyzer:
                 SELECT 
                     device_type,
                     location,
-                    COUNT(*) as total_simulations,
-                    SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) as clicks,
-                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate,
-                    ROUND(100.0 * SUM(CASE WHEN provided_credentials THEN 1 ELSE 0 END) / COUNT(*), 1) as credential_rate
-                FROM phishing_simulations
+                    SUM(simulations) as total_simulations,
+                    SUM(clicks) as clicks,
+                    ROUND(100.0 * SUM(clicks) / SUM(simulations), 1) as click_rate,
+                    ROUND(100.0 * SUM(credentials) / SUM(simulations), 1) as credential_rate
+                FROM combo_summary
                 GROUP BY device_type, location
                 ORDER BY click_rate DESC
             ''',
             
             'Department Vulnerability': '''
                 SELECT 
-                    e.department,
-                    COUNT(DISTINCT e.employee_id) as employee_count,
-                    COUNT(ps.simulation_id) as total_simulations,
-                    SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) as total_clicks,
-                    ROUND(100.0 * SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as click_rate,
-                    ROUND(100.0 * SUM(CASE WHEN ps.provided_credentials THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as credential_rate,
-                    ROUND(AVG(e.security_training_score), 1) as avg_training_score
-                FROM employees e
-                JOIN phishing_simulations ps ON e.employee_id = ps.employee_id
-                GROUP BY e.department
+                    department,
+                    COUNT(*) as employee_count,
+                    SUM(simulations) as total_simulations,
+                    SUM(clicks) as total_clicks,
+                    ROUND(100.0 * SUM(clicks) / SUM(simulations), 1) as click_rate,
+                    ROUND(100.0 * SUM(credentials) / SUM(simulations), 1) as credential_rate,
+                    -- Weighted by simulations, matching an average over the joined rows
+                    ROUND(SUM(security_training_score * simulations)
+                          / SUM(CASE WHEN security_training_score IS NOT NULL THEN simulations END), 1) as avg_training_score
+                FROM employee_summary
+                GROUP BY department
                 ORDER BY click_rate DESC
             ''',
             
@@ -392,29 +568,26 @@ class HumanWeaknessAnalyzer:
                     day_of_week,
                     device_type,
                     location,
-                    COUNT(*) as simulations,
-                    ROUND(100.0 * SUM(CASE WHEN clicked_link THEN 1 ELSE 0 END) / COUNT(*), 1) as click_rate
-                FROM phishing_simulations
-                GROUP BY hour_of_day, day_of_week, device_type, location
-                HAVING simulations >= 2
+                    simulations,
+                    ROUND(100.0 * clicks / simulations, 1) as click_rate
+                FROM combo_summary
+                WHERE simulations >= 2
                 ORDER BY click_rate DESC
                 LIMIT 15
             ''',
             
             'Employee Risk Profile': '''
                 SELECT 
-                    e.employee_code,
-                    e.department,
-                    e.tenure_months,
-                    e.security_training_score,
-                    COUNT(ps.simulation_id) as total_simulations,
-                    SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) as times_clicked,
-                    ROUND(100.0 * SUM(CASE WHEN ps.clicked_link THEN 1 ELSE 0 END) / COUNT(ps.simulation_id), 1) as personal_click_rate,
-                    SUM(CASE WHEN ps.provided_credentials THEN 1 ELSE 0 END) as times_gave_credentials
-                FROM employees e
-                JOIN phishing_simulations ps ON e.employee_id = ps.employee_id
-                GROUP BY e.employee_id
-                HAVING times_clicked >= 1
+                    employee_code,
+                    department,
+                    tenure_months,
+                    security_training_score,
+                    simulations as total_simulations,
+                    clicks as times_clicked,
+                    ROUND(100.0 * clicks / simulations, 1) as personal_click_rate,
+                    credentials as times_gave_credentials
+                FROM employee_summary
+                WHERE clicks >= 1
                 ORDER BY personal_click_rate DESC
                 LIMIT 20
             '''
@@ -422,10 +595,14 @@ class HumanWeaknessAnalyzer:
     
     def run_analysis(self):
         """Execute SQL analysis queries"""
-        # Check if we have data
+        # Check if we have data; the row counts and highest ids also identify
+        # the data the last analysis ran on
         cursor = self.conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM phishing_simulations')
-        if cursor.fetchone()[0] == 0:
+        fingerprint = tuple(cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM phishing_simulations), (SELECT MAX(simulation_id) FROM phishing_simulations),
+                   (SELECT COUNT(*) FROM employees), (SELECT MAX(employee_id) FROM employees)
+        ''').fetchone())
+        if fingerprint[0] == 0:
             print("\n⚠️  No simulation data available for analysis")
             return {}
         
@@ -434,47 +611,107 @@ class HumanWeaknessAnalyzer:
         print("="*60)
         
         results = {}
-        queries = self.get_analysis_queries()
-        
-        for query_name, query in queries.items():
+        outcomes = self._analysis_cache.get(fingerprint)
+        if outcomes is None:
+            queries = self.get_analysis_queries()
+            
+            # One pass over the simulations feeds every query; the queries
+            # themselves only read the small summary tables
+            outcomes = {}
             try:
-                df = pd.read_sql_query(query, self.conn)
-                if not df.empty:
-                    results[query_name] = df
-                    print(f"\n{query_name}")
-                    print("-" * 60)
-                    print(df.to_string(index=False))
-                else:
-                    print(f"\n{query_name}")
-                    print("-" * 60)
-                    print("No data available")
+                self.build_analysis_summaries()
+                for name, query in queries.items():
+                    try:
+                        outcomes[name] = self._run_query(query)
+                    except Exception as e:
+                        outcomes[name] = e
             except Exception as e:
-                print(f"\n❌ Error in {query_name}: {str(e)}")
+                outcomes = dict.fromkeys(queries, e)
+            
+            # Only keep a complete run for the next "Run Analysis" on unchanged data
+            if not any(isinstance(outcome, Exception) for outcome in outcomes.values()):
+                self._analysis_cache = {fingerprint: outcomes}
+        
+        for query_name, df in outcomes.items():
+            if isinstance(df, Exception):
+                print(f"\n❌ Error in {query_name}: {str(df)}")
+            elif not df.empty:
+                results[query_name] = df
+                print(f"\n{query_name}")
+                print("-" * 60)
+                df.to_string(buf=sys.stdout, index=False)
+                sys.stdout.write("\n")
+            else:
+                print(f"\n{query_name}")
+                print("-" * 60)
+                print("No data available")
         
         return results
     
-    def create_visualizations(self, results):
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        # WAL with synchronous=NORMAL only syncs at checkpoints, not on every commit
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+    
+    def _run_query(self, query, dtype=None):
+        """Run one read-only query into a DataFrame"""
+        cursor = self.conn.execute(query)
+        df = pd.DataFrame.from_records(cursor.fetchall(),
+                                       columns=[col[0] for col in cursor.description])
+        if 'day_of_week' in df:
+            # Named from here on, but the categorical still holds (and groups by) the codes
+            df['day_of_week'] = pd.Categorical.from_codes(df['day_of_week'].to_numpy(dtype='int64'),
+                                                          categories=DAY_NAMES, ordered=True)
+        return df if dtype is None else df.astype(dtype)
+    
+    def create_visualizations(self, results, dpi=150):
         """Generate heatmaps and visualizations"""
         if not results:
             print("\n⚠️  No data available for visualization")
             return
         
-        fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+        # Plotting libraries are imported on first use; the other menu options never need them
+        import matplotlib
+        if HEADLESS:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
+        # Reuse the same numbered figure and its 2x2 axes on every run; only the heatmap
+        # colorbars are rebuilt, as seaborn adds a new one with each heatmap. A closed
+        # window comes back as a new figure, which gets new axes
+        fig = plt.figure(num='Human Weakness Heatmap', figsize=(16, 12))
+        axes = self._figure_axes
+        if axes is None or axes[0, 0].figure is not fig:
+            fig.clear()
+            axes = self._figure_axes = fig.subplots(2, 2)
+        else:
+            for ax in axes.flat:
+                for mesh in ax.collections:
+                    if mesh.colorbar is not None:
+                        mesh.colorbar.remove()
+                ax.clear()
+            # Undo the last tight_layout, so seaborn sizes (and rotates) tick labels as on a new figure
+            fig.subplots_adjust(**{name: plt.rcParams[f'figure.subplot.{name}']
+                                   for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')})
         fig.suptitle('Human Weakness Heatmap Analysis', fontsize=16, fontweight='bold')
         
-        # 1. Time-based heatmap
-        if 'Time Pattern Analysis' in results and not results['Time Pattern Analysis'].empty:
-            time_data = results['Time Pattern Analysis']
-            pivot = time_data.pivot_table(index='hour_of_day', columns='day_of_week', 
-                                         values='click_rate', fill_value=0)
-            
-            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            existing_days = [day for day in day_order if day in pivot.columns]
-            if existing_days:
-                pivot = pivot[existing_days]
-            
+        # 1. Time-based heatmap: every hour/day cell, already one column per day from
+        # the summary run_analysis built; days with no simulations read as 0
+        try:
+            pivot = self._run_query(TIME_PIVOT_QUERY, TIME_PIVOT_DTYPES).set_index('hour_of_day').fillna(0)
+        except sqlite3.Error:
+            pivot = None
+        if pivot is not None and not pivot.empty:
             sns.heatmap(pivot, annot=True, fmt='.1f', cmap='YlOrRd', 
-                       ax=axes[0,0], cbar_kws={'label': 'Click Rate (%)'})
+                       ax=axes[0,0], cbar_kws={'label': 'Click Rate (%)'}, rasterized=True)
             axes[0,0].set_title('Click Rate by Hour and Day', fontweight='bold')
             axes[0,0].set_xlabel('Day of Week')
             axes[0,0].set_ylabel('Hour of Day')
@@ -489,7 +726,7 @@ class HumanWeaknessAnalyzer:
                                            values='click_rate', fill_value=0)
             
             sns.heatmap(pivot, annot=True, fmt='.1f', cmap='YlOrRd',
-                       ax=axes[0,1], cbar_kws={'label': 'Click Rate (%)'})
+                       ax=axes[0,1], cbar_kws={'label': 'Click Rate (%)'}, rasterized=True)
             axes[0,1].set_title('Click Rate by Device and Location', fontweight='bold')
             axes[0,1].set_xlabel('Location')
             axes[0,1].set_ylabel('Device Type')
@@ -523,8 +760,8 @@ class HumanWeaknessAnalyzer:
             axes[1,1].barh(y_pos, risk_data['click_rate'], color='#ff6b6b')
             axes[1,1].set_yticks(y_pos)
             
-            labels = [f"{row['hour_of_day']}:00 {row['day_of_week'][:3]}\n{row['device_type']}" 
-                     for _, row in risk_data.iterrows()]
+            labels = [f"{row.hour_of_day}:00 {row.day_of_week[:3]}\n{row.device_type}" 
+                     for row in risk_data.itertuples(index=False)]
             axes[1,1].set_yticklabels(labels, fontsize=8)
             axes[1,1].set_xlabel('Click Rate (%)')
             axes[1,1].set_title('Top Risk Scenarios', fontweight='bold')
@@ -535,9 +772,10 @@ class HumanWeaknessAnalyzer:
         
         plt.tight_layout()
         output_path = os.path.join(self.script_dir, 'human_weakness_heatmap.png')
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
+        plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
         print(f"\n✓ Visualizations saved to '{output_path}'")
-        plt.show()
+        if not HEADLESS:
+            plt.show()
     
     def generate_recommendations(self, results):
         """Generate actionable security recommendations"""